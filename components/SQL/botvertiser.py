@@ -1,20 +1,91 @@
 from langflow.custom import Component
-from langflow.io import MessageTextInput, MultilineInput, SecretStrInput, DropdownInput, Output
+from langflow.io import MessageTextInput, MultilineInput, SecretStrInput, DropdownInput, IntInput, Output
 from langflow.schema import Message
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 from google.oauth2 import service_account
+from cachetools import TTLCache
 from decimal import Decimal
+from functools import lru_cache
+import asyncio
+import hashlib
 import json
+import orjson
+import re
 
-# Custom encoder to handle Decimal values from BigQuery
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super().default(obj)
+CLIENTS = ["Olas Media", "Independent Voter Project", "IVC Business Account", "DigitalSolutions"]
+
+# Literals that vary between otherwise identical questions: client names, dates and numbers
+_LITERAL_RE = re.compile(
+    "(?P<client>" + "|".join(re.escape(c) for c in sorted(CLIENTS, key=len, reverse=True)) + ")"
+    r"|(?P<date>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|(?P<num>\b\d+(?:\.\d+)?\b)"
+)
+_PLACEHOLDER_RE = re.compile(r"\{(?:client|date|num)(\d+)\}")
+
+# Leading/trailing markdown code fences around the generated SQL
+_FENCE_RE = re.compile(r"^```(?:sql)?\s*|\s*```\s*$", re.S)
+
+# orjson fallback to handle Decimal values from BigQuery
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+# Reuse one chat model (and its HTTP connection pool) per API key and model
+@lru_cache(maxsize=8)
+def _get_chat_openai(api_key, model_name):
+    return ChatOpenAI(temperature=0, model_name=model_name, api_key=api_key)
+
+# Generated SQL keyed by prompt, schema, client, question and model; one cache per TTL
+@lru_cache(maxsize=4)
+def _get_sql_cache(ttl):
+    return TTLCache(maxsize=1024, ttl=ttl)
+
+def _sql_cache_key(*parts):
+    return hashlib.blake2b("\x00".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+
+# Replace literals with numbered placeholders, e.g. "clicks on 2025-04-16" -> "clicks on {date0}".
+# A literal that repeats reuses its placeholder.
+def _templatize(text):
+    values = []
+    def replace(match):
+        value = match.group()
+        if value not in values:
+            values.append(value)
+        return f"{{{match.lastgroup}{values.index(value)}}}"
+    return _LITERAL_RE.sub(replace, text), values
+
+# Turn generated SQL into a template for the question's literals. Only safe when
+# every literal appears exactly once in the SQL; otherwise None.
+def _sql_to_template(sql, values):
+    for idx, value in enumerate(values):
+        pattern = re.compile(r"(?<![\w.-])" + re.escape(value) + r"(?![\w.-])")
+        if len(pattern.findall(sql)) != 1:
+            return None
+        sql = pattern.sub(lambda _: f"{{{_LITERAL_RE.match(value).lastgroup}{idx}}}", sql)
+    return sql
+
+def _fill_template(sql_template, values):
+    return _PLACEHOLDER_RE.sub(lambda m: values[int(m.group(1))], sql_template)
+
+# Build credentials and the BigQuery client once per service account so warm
+# calls reuse the client's HTTPS connection pool
+@lru_cache(maxsize=4)
+def _get_bq_client(service_account_json):
+    service_account_info = json.loads(service_account_json)
+    credentials = service_account.Credentials.from_service_account_info(service_account_info)
+    project_id = service_account_info["project_id"]
+    client = bigquery.Client(credentials=credentials, project=project_id)
+    return credentials, project_id, client
+
+# Storage Read API client for pulling query results as Arrow record batches
+@lru_cache(maxsize=4)
+def _get_bq_storage_client(service_account_json):
+    credentials, _, _ = _get_bq_client(service_account_json)
+    return bigquery_storage.BigQueryReadClient(credentials=credentials)
 
 class NLToBigQueryComponent(Component):
     display_name = "Botvertiser"
@@ -33,7 +104,7 @@ class NLToBigQueryComponent(Component):
         DropdownInput(
             name="client",
             display_name="Client",
-            options=["Olas Media", "Independent Voter Project", "IVC Business Account", "DigitalSolutions"],
+            options=CLIENTS,
             value="Olas Media",
             required=True,
             info="Select the client for this query",
@@ -79,6 +150,14 @@ class NLToBigQueryComponent(Component):
             value="No",
             required=False,
             info="Choose whether to include the generated SQL in the output"
+        ),
+        IntInput(
+            name="cache_ttl",
+            display_name="SQL Cache TTL (seconds)",
+            value=3600,
+            required=False,
+            advanced=True,
+            info="How long to reuse SQL generated for an identical question. Set to 0 to disable caching."
         )
     ]
     
@@ -86,24 +165,43 @@ class NLToBigQueryComponent(Component):
         Output(display_name="Query Result", name="output", method="build_output"),
     ]
     
-    def build_output(self) -> Message:
+    async def build_output(self) -> Message:
         try:
-            # Step 1: Generate SQL from natural language
-            generated_sql = self.generate_sql(
-                self.question,
-                self.client,
-                self.prompt,
-                self.schema,
-                self.model_name,
-                self.openai_api_key
+            # Warm up the BigQuery clients in a thread while the LLM call is in flight
+            bq_warmup = asyncio.create_task(
+                asyncio.to_thread(_get_bq_storage_client, self.service_account_json)
             )
             
+            # Step 1: Generate SQL from natural language
+            try:
+                generated_sql, cache_entries = await self.generate_sql(
+                    self.question,
+                    self.client,
+                    self.prompt,
+                    self.schema,
+                    self.model_name,
+                    self.openai_api_key,
+                    self.cache_ttl
+                )
+            except BaseException:
+                # Don't leave the warm-up behind with an unretrieved exception
+                bq_warmup.cancel()
+                await asyncio.gather(bq_warmup, return_exceptions=True)
+                raise
+            
             # Step 2: Execute the SQL on BigQuery
-            query_result = self.execute_sql(
+            await bq_warmup
+            query_result = await asyncio.to_thread(
+                self.execute_sql,
                 generated_sql,
                 self.service_account_json
             )
             
+            # Only cache SQL that BigQuery actually ran, so a bad generation can
+            # be retried instead of being served from the cache
+            if cache_entries:
+                _get_sql_cache(self.cache_ttl).update(cache_entries)
+            
             # Step 3: Format the response
             if self.show_sql == "Yes":
                 output = f"Generated SQL:\n{generated_sql}\n\nQuery Result:\n{query_result}"
@@ -114,35 +212,56 @@ class NLToBigQueryComponent(Component):
         except Exception as e:
             return Message(text=f"Error: {str(e)}")
     
-    def generate_sql(self, question, client, prompt, schema, model_name, api_key):
-        # Combine prompt with dynamic input including client
-        full_prompt = f"{prompt}\n\nTABLE SCHEMA:\n{schema}\n\nCLIENT: {client}\n\nUSER QUESTION: {question}\n\nSQL:"
+    async def generate_sql(self, question, client, prompt, schema, model_name, api_key, cache_ttl=0):
+        """Return the SQL and the cache entries to store once it has run successfully."""
+        # Reuse SQL generated for an identical question
+        cache = _get_sql_cache(cache_ttl) if cache_ttl and cache_ttl > 0 else None
+        cache_key = _sql_cache_key(prompt, schema, client, question, model_name)
+        cached_sql = cache.get(cache_key) if cache is not None else None
+        if cached_sql is not None:
+            return cached_sql, {}
         
-        # Create prompt template and LLM chain
-        llm_prompt = PromptTemplate.from_template("{prompt}")
-        llm = ChatOpenAI(temperature=0, model_name=model_name, api_key=api_key)
-        chain = LLMChain(llm=llm, prompt=llm_prompt)
+        # Fall back to SQL cached for a question that differs only in its literals
+        question_template, values = _templatize(f"{client}\n{question}")
+        template_key = _sql_cache_key("template", prompt, schema, model_name, question_template)
+        sql_template = cache.get(template_key) if cache is not None and values else None
+        if sql_template is not None:
+            sql = _fill_template(sql_template, values)
+            return sql, {cache_key: sql}
         
-        # Run the chain
-        sql = chain.run({"prompt": full_prompt}).strip()
+        # Keep the static prompt and schema as a stable prefix so OpenAI's
+        # automatic prompt caching can reuse it; only the user turn varies
+        system_prompt = f"{prompt}\n\nTABLE SCHEMA:\n{schema}"
+        user_prompt = f"CLIENT: {client}\n\nUSER QUESTION: {question}\n\nSQL:"
         
+        # Call the cached chat model directly
+        llm = _get_chat_openai(api_key, model_name)
+        response = await llm.ainvoke([
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_prompt),
+        ])
         # Clean up the response (remove potential markdown formatting)
-        sql = sql.replace("```sql", "").replace("```", "").strip()
+        sql = _FENCE_RE.sub("", response.content.strip()).strip()
         
-        return sql
+        cache_entries = {}
+        if cache is not None:
+            cache_entries[cache_key] = sql
+            sql_template = _sql_to_template(sql, values) if values else None
+            if sql_template is not None:
+                cache_entries[template_key] = sql_template
+        
+        return sql, cache_entries
     
     def execute_sql(self, query, service_account_json):
-        # Get service account JSON from secrets
-        service_account_info = json.loads(service_account_json)
-        
-        # Setup BigQuery client
-        credentials = service_account.Credentials.from_service_account_info(service_account_info)
-        client = bigquery.Client(credentials=credentials, project=service_account_info["project_id"])
+        # Get the cached BigQuery client for this service account
+        _, _, client = _get_bq_client(service_account_json)
+        bqstorage_client = _get_bq_storage_client(service_account_json)
         
-        # Execute query
+        # Execute query and fetch the results as Arrow record batches
         query_job = client.query(query)
-        results = query_job.result()
         
         # Format results
-        rows = [dict(row.items()) for row in results]
-        return json.dumps(rows, indent=2, cls=DecimalEncoder) or "No results found."
\ No newline at end of file
+        rows = []
+        for batch in query_job.result().to_arrow_iterable(bqstorage_client=bqstorage_client):
+            rows.extend(batch.to_pylist())
+        return orjson.dumps(rows, default=_json_default, option=orjson.OPT_INDENT_2).decode() or "No results found."
\ No newline at end of file
@@ -3,15 +3,30 @@ from langflow.io import MessageTextInput, Output, IntInput
 from langflow.schema.message import Message
 from langflow.schema.content_block import ContentBlock
 from langflow.schema.content_types import MediaContent
+import asyncio
 import base64
-import tempfile
-from pathlib import Path
 import httpx
+import io
 import json
+from typing import BinaryIO
+import logging
 
 import cloudinary
 import cloudinary.uploader
 
+logger = logging.getLogger(__name__)
+
+# Ask Cloudinary for a JPG rendition unless the URL isn't a Cloudinary upload or already is one
+def _to_jpg(url):
+    if "/upload/" in url and "/f_jpg/" not in url:
+        return url.replace("/upload/", "/upload/f_jpg/", 1)
+    return url
+
+# Byte-identical prompts let OpenAI's server-side prefix cache hit across repeated calls
+def _normalize_prompt(prompt):
+    lines = prompt.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
 class GPTImageTool(Component):
     display_name = "GPT Image Generator/Editor"
     description = "Generate or edit an image using OpenAI's gpt-image-1 model"
@@ -73,118 +88,100 @@ class GPTImageTool(Component):
         Output(display_name="Image Message", name="output", method="build_output", field_type="Message"),
     ]
 
-    async def get_image_bytes(self) -> str:
+    async def get_image_file(self) -> BinaryIO:
         try:
             headers = {"Authorization": f"Bearer {self.api_key}"}
-            temp_files = []
-    
-            if self.image_url:
-                # Parse image URL(s)
-                try:
-                    image_urls = json.loads(self.image_url)
-                    if not isinstance(image_urls, list):
-                        image_urls = [image_urls]
-                except json.JSONDecodeError:
-                    image_urls = [self.image_url]
-    
-                # Prepare multipart files
-                files = [
-                    ("model", (None, "gpt-image-1")),
-                    ("prompt", (None, self.prompt)),
-                ]
-    
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    for idx, url in enumerate(image_urls):
-                        # Convert the URL to request JPG format
-                        if "/upload/" in url:
-                            url = url.replace("/upload/", "/upload/f_jpg/")
-                        img_response = await client.get(url)
-                        # self.log("downlaoding image....")
-                        # self.log(img_response.raise_for_status())
-                        print("downlaoding image....")
-                        print(img_response.raise_for_status())
+            prompt = _normalize_prompt(self.prompt)
+    
+            # One client for every request so connections (and HTTP/2 streams) are reused
+            async with httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=True,
+                limits=httpx.Limits(max_connections=20),
+            ) as client:
+                if self.image_url:
+                    # Parse image URL(s)
+                    try:
+                        image_urls = json.loads(self.image_url)
+                        if not isinstance(image_urls, list):
+                            image_urls = [image_urls]
+                    except json.JSONDecodeError:
+                        image_urls = [self.image_url]
+    
+                    # Prepare multipart files; the static fields go ahead of the images
+                    files = [
+                        ("model", (None, "gpt-image-1")),
+                        ("prompt", (None, prompt)),
+                    ]
+    
+                    # Convert the URLs to request JPG format and download them concurrently
+                    img_responses = await asyncio.gather(*[
+                        client.get(_to_jpg(url), timeout=30.0)
+                        for url in image_urls
+                    ])
+                    for idx, img_response in enumerate(img_responses):
                         img_response.raise_for_status()
-                        temp_path = Path(tempfile.mkstemp(suffix=".jpg")[1])
-                        temp_path.write_bytes(img_response.content)
-                        temp_files.append(temp_path)
                         files.append(
-                            ("image[]", (f"image{idx}.jpg", temp_path.open("rb"), "image/jpeg"))
+                            ("image[]", (f"image{idx}.jpg", img_response.content, "image/jpeg"))
                         )
     
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    # self.log("sending api request to open ai: ")
-                    # self.log(headers)
-                    # self.log(files)
-                    
-                    print("sending api request to open ai: ")
-                    print(headers)
-                    print(files)
-                    
+                    logger.debug("Sending %d image(s) to the OpenAI images/edits endpoint", len(img_responses))
                     response = await client.post(
                         "https://api.openai.com/v1/images/edits",
                         headers=headers,
                         files=files,
                     )
                     response.raise_for_status()
-                    
-                    # self.log("post request response from opejn ai: ")
-                    # self.log(response.raise_for_status())
-                    print("post request response from opejn ai: ")
-                    print(response)
-            else:
-                # Image generation mode
-                headers["Content-Type"] = "application/json"
-                payload = {
-                    "model": "gpt-image-1",
-                    "prompt": self.prompt,
-                    "n": 1,
-                    "size": self.size
-                }
-                async with httpx.AsyncClient(timeout=60.0) as client:
+                else:
+                    # Image generation mode
+                    headers["Content-Type"] = "application/json"
+                    payload = {
+                        "model": "gpt-image-1",
+                        "prompt": prompt,
+                        "n": 1,
+                        "size": self.size
+                    }
                     response = await client.post(
                         "https://api.openai.com/v1/images/generations",
                         headers=headers,
-                        json=payload
+                        json=payload,
+                        timeout=60.0,
                     )
                     response.raise_for_status()
     
-            result = response.json()
-            print("here's what we got back from open ai: ")
-            print(result)
-            image_data = result["data"][0]
+                result = response.json()
+                logger.debug("OpenAI images response status: %s", response.status_code)
+                image_data = result["data"][0]
     
-            if "b64_json" in image_data:
-                image_bytes = base64.b64decode(image_data["b64_json"])
-            elif "url" in image_data:
-                img_resp = await httpx.AsyncClient().get(image_data["url"])
-                img_resp.raise_for_status()
-                image_bytes = img_resp.content
-            else:
-                raise ValueError("No image data found in OpenAI response.")
+                if "b64_json" in image_data:
+                    image_file = io.BytesIO(base64.b64decode(image_data["b64_json"]))
+                elif "url" in image_data:
+                    img_resp = await client.get(image_data["url"])
+                    img_resp.raise_for_status()
+                    image_file = io.BytesIO(img_resp.content)
+                else:
+                    raise ValueError("No image data found in OpenAI response.")
     
-            # Clean up temp files
-            for f in temp_files:
-                try:
-                    f.unlink()
-                except Exception:
-                    pass
-    
-            return f"data:image/png;base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+            return image_file
     
         except Exception as e:
-            raise RuntimeError(f"❌ Error in get_image_bytes: {str(e)}")
+            raise RuntimeError(f"❌ Error in get_image_file: {str(e)}")
     
                 
             
-    async def upload_to_cloudinary(self, data_uri: str) -> str:
-        cloudinary.config(
+    async def upload_to_cloudinary(self, image_file: BinaryIO) -> str:
+        # The Cloudinary SDK is blocking, so upload from a worker thread. Credentials
+        # go on the call itself: cloudinary.config is process-global and another
+        # flow could reconfigure it before the thread runs
+        result = await asyncio.to_thread(
+            cloudinary.uploader.upload,
+            image_file,
+            resource_type="image",
             cloud_name=self.cloudinary_cloud_name,
             api_key=self.cloudinary_api_key,
             api_secret=self.cloudinary_api_secret,
-            secure=True
+            secure=True,
         )
-    
-        result = cloudinary.uploader.upload(data_uri)
         if "secure_url" not in result:
             raise RuntimeError(f"Cloudinary upload failed: {result}")
             return "no url generated"
@@ -194,8 +191,8 @@ class GPTImageTool(Component):
         
     async def build_output(self) -> Message:
         try:
-            data_uri = await self.get_image_bytes()
-            cloudinary_url = await self.upload_to_cloudinary(data_uri)
+            with await self.get_image_file() as image_file:
+                cloudinary_url = await self.upload_to_cloudinary(image_file)
     
             media_content = MediaContent(
                 type="media",
@@ -1,8 +1,16 @@
-import json
+import orjson
 from langflow.custom import Component
 from langflow.io import MessageTextInput, Output
 from langflow.schema import Message
 
+# Builds the output text for each supported event type from the event and its file URLs
+_HANDLERS = {
+    # Extract the reaction value
+    "reaction_added": lambda event_data, urls_string: f"{event_data.get('reaction', 'No reaction found')}\n{urls_string}",
+    # Extract the message text
+    "app_mention": lambda event_data, urls_string: f"{event_data.get('text', 'No message found')}\n{urls_string}",
+}
+
 class SlackEventComponent(Component):
     display_name = "Slack Event Component"
     description = "Processes Slack JSON payloads for reactions and app mentions."
@@ -27,7 +35,7 @@ class SlackEventComponent(Component):
     def build_output(self) -> Message:
         try:
             # Parse the input JSON string
-            event_data = json.loads(self.input_value)
+            event_data = orjson.loads(self.input_value)
             files_list = event_data.get("files", []) # Safely get files list or empty list
 
             slack_urls = []
@@ -42,22 +50,17 @@ class SlackEventComponent(Component):
             
             event_type = event_data.get("type", "")
 
-            if event_type == "reaction_added":
-                # Extract the reaction value
-                reaction = event_data.get("reaction", "No reaction found")
-                output = f"{reaction}\n{urls_string}"
-            elif event_type == "app_mention":
-                # Extract the message text
-                message = event_data.get("text", "No message found")
-                output = f"{message}\n{urls_string}"
+            handler = _HANDLERS.get(event_type)
+            if handler:
+                output = handler(event_data, urls_string)
             else:
                 output = {"error": "Unknown event type"}
 
-        except json.JSONDecodeError:
+        except (orjson.JSONDecodeError, ValueError):
             output = {"error": "Invalid JSON input"}
 
         # Convert the output dictionary to a JSON string
-        output_str = json.dumps(output)
+        output_str = orjson.dumps(output).decode()
         print(output_str)
 
         # Create a Message object with the stringified output
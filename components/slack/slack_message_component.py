@@ -1,9 +1,40 @@
-from slack_sdk import WebClient
+import asyncio
+import weakref
+import aiohttp
+from slack_sdk.web.async_client import AsyncWebClient
 from langflow.custom import Component
 from langflow.io import MessageTextInput, StrInput, Output
 from langflow.schema import Data
 
 
+# Without a session AsyncWebClient opens and closes an aiohttp session on every
+# call, so keep one per event loop (sessions can't cross loops) for TLS and
+# connection reuse. Each entry also holds the generator that closes the session.
+_SESSIONS = weakref.WeakKeyDictionary()
+
+
+async def _close_on_loop_shutdown(session):
+    # asyncio.run() and loop.shutdown_asyncgens() finalize unfinished async
+    # generators while the loop is still running, so the session is closed on
+    # its own loop instead of being reported as unclosed at exit
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+async def _get_slack_client(token):
+    loop = asyncio.get_running_loop()
+    session, _ = _SESSIONS.get(loop, (None, None))
+    if session is None or session.closed:
+        # Same 30s timeout AsyncWebClient gives the sessions it creates itself
+        session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        closer = _close_on_loop_shutdown(session)
+        await closer.__anext__()
+        _SESSIONS[loop] = (session, closer)
+    return AsyncWebClient(token=token, session=session)
+
+
 class SlackMessageComponent(Component):
     display_name = "Slack Message Sender"
     description = "Send a message to a Slack channel."
@@ -38,21 +69,23 @@ class SlackMessageComponent(Component):
         Output(display_name="Result", name="result", method="send_slack_message"),
     ]
 
-    def send_slack_message(self) -> Data:
+    async def send_slack_message(self) -> Data:
         # Ensure the slack_token is provided
         if not self.slack_token:
             error_message = "Error: Slack bot token is required."
             print(error_message)
             return Data(value=error_message)
             
-        # Initialize the Slack WebClient
+        # Get the Slack AsyncWebClient
         try:
-            client = WebClient(token=self.slack_token)
+            client = await _get_slack_client(self.slack_token)
             
-            channel_id, thread_ts = self.session_id.split('-', 1)
+            channel_id, sep, thread_ts = self.session_id.partition('-')
+            if not sep:
+                raise ValueError(f"Invalid session ID: {self.session_id}")
             
             # Use the client to send a message
-            response = client.chat_postMessage(
+            response = await client.chat_postMessage(
                 channel=channel_id,
                 thread_ts=thread_ts,
                 text=self.message
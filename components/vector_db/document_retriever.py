@@ -1,23 +1,127 @@
 from typing import Any
+from functools import lru_cache
+import asyncio
+import hashlib
+import weakref
+from collections import OrderedDict
 from llama_index_cloud_sql_pg import PostgresEngine
 from llama_index_cloud_sql_pg import PostgresDocumentStore
-import nest_asyncio
-
-nest_asyncio.apply()
-from pinecone import Pinecone
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from llama_index.core.vector_stores.types import (
-    MetadataFilter,
-    MetadataFilters,
-    FilterOperator,
-)
-from llama_index.core.schema import NodeRelationship
+from pinecone.grpc import PineconeGRPC as Pinecone
 
 from langflow.custom import Component
 from langflow.io import StrInput, SecretStrInput, Output
 from langflow.schema import Message
 
 
+# Clients are cached at module level so warm retrievals skip the Pinecone setup
+# and the Cloud SQL connector handshake. Doc stores are keyed by the password
+# hash, so a rotated password gets its own entry; past _MAX_DOC_STORES the least
+# recently used one is dropped and its engine's pool closed once nothing is
+# still reading from it.
+_DOC_STORES = OrderedDict()
+_MAX_DOC_STORES = 4
+# Serializes cold starts so concurrent retrievals don't each open an engine.
+# asyncio locks belong to one loop, so there is one per loop.
+_DOC_STORE_LOCKS = weakref.WeakKeyDictionary()
+
+
+class _DocStoreEntry:
+    def __init__(self, engine, doc_store):
+        self.engine = engine
+        self.doc_store = doc_store
+        self.users = 0
+        self.evicted = False
+
+
+# Metadata filter keys from most to least selective. Compound filters list the
+# most selective key first so the engine can narrow on it before the rest, as
+# with the predicate-order fix for LokiJS/Azurite lookups.
+FILTER_KEY_ORDER = ("file_id", "doc_id", "client", "user_id", "title", "source")
+
+
+def _build_filter(conditions):
+    """Build a Pinecone $eq filter from {key: value}, keys ordered by FILTER_KEY_ORDER."""
+    def rank(key):
+        return FILTER_KEY_ORDER.index(key) if key in FILTER_KEY_ORDER else len(FILTER_KEY_ORDER)
+    return {key: {"$eq": conditions[key]} for key in sorted(conditions, key=rank)}
+
+
+@lru_cache(maxsize=8)
+def _get_pc(api_key):
+    return Pinecone(api_key=api_key)
+
+
+@lru_cache(maxsize=16)
+def _get_pinecone_index(pc, index_name):
+    return pc.Index(index_name)
+
+
+@lru_cache(maxsize=16)
+def _get_index_dimension(pc, index_name):
+    return pc.describe_index(index_name).dimension
+
+
+# Client setup and describe_index block on network I/O the first time, so this
+# runs in a worker thread; warm calls are just cache hits
+def _open_pinecone_index(api_key, index_name):
+    pc = _get_pc(api_key)
+    return _get_pinecone_index(pc, index_name), _get_index_dimension(pc, index_name)
+
+
+async def _acquire_doc_store(password):
+    """Return the cached entry for a password, creating it on first use, with
+    its user count already taken so eviction can't close it mid-retrieval."""
+    key = hashlib.sha256(password.encode()).hexdigest()
+    entry = _DOC_STORES.get(key)
+    if entry is None:
+        lock = _DOC_STORE_LOCKS.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        async with lock:
+            entry = _DOC_STORES.get(key)
+            if entry is None:
+                entry = await _create_doc_store(password)
+                _DOC_STORES[key] = entry
+                # Entries are only added under this lock, so the new one can't
+                # be evicted while the old engine closes
+                if len(_DOC_STORES) > _MAX_DOC_STORES:
+                    _, old_entry = _DOC_STORES.popitem(last=False)
+                    old_entry.evicted = True
+                    if old_entry.users == 0:
+                        await old_entry.engine.close()
+    _DOC_STORES.move_to_end(key)
+    entry.users += 1
+    return entry
+
+
+async def _release_doc_store(entry):
+    entry.users -= 1
+    if entry.evicted and entry.users == 0:
+        await entry.engine.close()
+
+
+async def _create_doc_store(password):
+    # from_instance runs the engine on the library's background loop, so the
+    # cached engine works from whichever event loop later calls it
+    engine = await asyncio.to_thread(
+        PostgresEngine.from_instance,
+        project_id="knowledge-base-458316",
+        region="us-central1",
+        instance="llamaindex-docstore",
+        database="docstore",
+        user="docstore_rw",
+        password=password,
+        ip_type="public",
+    )
+    try:
+        doc_store = await PostgresDocumentStore.create(
+            engine=engine,
+            table_name="document_store",
+            # schema_name=SCHEMA_NAME
+        )
+    except BaseException:
+        await engine.close()
+        raise
+    return _DocStoreEntry(engine, doc_store)
+
 
 class PineconeDocumentRetriever(Component):
     """Retrieves document text from Pinecone based on file path."""
@@ -77,83 +181,89 @@ class PineconeDocumentRetriever(Component):
         Raises:
             ValueError: If no document is found or if there's an error connecting to Pinecone
         """
+        messages = await self.retrieve_documents([self.file_id])
+        return messages[0]
+
+    async def retrieve_documents(self, file_ids: list[str]) -> list[Message]:
+        """
+        Retrieves the text of several documents at once, in the order of file_ids.
+
+        The Pinecone lookups and docstore fetches for all files run concurrently,
+        so K files cost about one round trip to each instead of K.
+
+        Returns:
+            list[Message]: One message per file ID with the document text
+
+        Raises:
+            ValueError: If any document is missing or if there's an error connecting to Pinecone
+        """
         try:
-            # Initialize Pinecone client
-            pc = Pinecone(api_key=self.PINECONE_API_KEY)
-            
-            # PostgresDocumentStore
-            engine = await PostgresEngine.afrom_instance(
-                project_id="knowledge-base-458316",
-                region="us-central1",
-                instance="llamaindex-docstore",
-                database="docstore",
-                user="docstore_rw",
-                password=self.docstore_password,
-                ip_type="public",
-            )
-            
-            doc_store = PostgresDocumentStore.create_sync(
-                engine=engine,
-                table_name="document_store",
-                # schema_name=SCHEMA_NAME
-            )
-            
-            # Get the specified index
+            # Get the cached Pinecone index and its dimension
             try:
-                pinecone_index = pc.Index(self.index_name)
-            except Exception as e:
-                msg = f"Error accessing Pinecone index '{self.index_name}': {str(e)}"
-                raise ValueError(msg) from e
-            
-            try:
-                # Create vector store
-                vector_store = PineconeVectorStore(
-                    pinecone_index=pinecone_index,
-                    namespace=self.namespace
+                pinecone_index, dimension = await asyncio.to_thread(
+                    _open_pinecone_index, self.PINECONE_API_KEY, self.index_name
                 )
             except Exception as e:
-                msg = f"Error creating vector store with namespace '{self.namespace}': {str(e)}"
+                msg = f"Error accessing Pinecone index '{self.index_name}': {str(e)}"
                 raise ValueError(msg) from e
-
-            # Create metadata filter
-            filters = MetadataFilters(
-                filters=[
-                    MetadataFilter(
-                        key="file_id",
-                        value=self.file_id,
-                        operator=FilterOperator.EQ
-                    )
-                ],
-            )
-
-            # Retrieve nodes
-            nodes = vector_store.get_nodes(filters=filters)
             
+            # Pinecone requires a query vector even for a pure metadata lookup, so
+            # send a fixed non-zero one and let the server-side filter pick the match
+            query_vector = [1.0] + [0.0] * (dimension - 1)
 
+            # One top_k=1 query per file rather than a single $in query: a file has
+            # many chunks, so top_k=len(file_ids) over $in could return several
+            # chunks of one file and none of another
+            doc_ids = await asyncio.gather(*[
+                self._find_doc_id(pinecone_index, query_vector, file_id)
+                for file_id in file_ids
+            ])
+            entry = await _acquire_doc_store(self.docstore_password)
+            try:
+                documents = await asyncio.gather(*[
+                    entry.doc_store.aget_document(doc_id=doc_id)
+                    for doc_id in doc_ids
+                ])
+            finally:
+                await _release_doc_store(entry)
 
-            if not nodes:
-                msg = f"No document found with file ID: {self.file_id}"
-                raise ValueError(msg)
-                
-            relationships = nodes[0].relationships
-            source_node_info = relationships.get(NodeRelationship.SOURCE)
-            document = doc_store.get_document(doc_id=source_node_info.node_id)
-
-            # Get text from first node
-            document_text = document.text
-            
-            # Log success
-            self.log(f"Successfully retrieved document from {self.file_id}")
-            self.log(f"document: {document.metadata.get('file path')}")
-            
-            message = Message(text=document_text)
-            return message
+            messages = []
+            for file_id, document in zip(file_ids, documents):
+                # Log success
+                self.log(f"Successfully retrieved document from {file_id}")
+                self.log(f"document: {document.metadata.get('file path')}")
+                messages.append(Message(text=document.text))
+            return messages
 
         except Exception as e:
             error_msg = f"Error retrieving document: {str(e)}"
             self.log(error_msg)
             raise ValueError(error_msg) from e
 
+    async def _find_doc_id(self, pinecone_index, query_vector, file_id):
+        """Look up the source document id for a file from one matching vector."""
+        # Fetch a single match for the file, metadata only
+        response = await asyncio.to_thread(
+            pinecone_index.query,
+            vector=query_vector,
+            top_k=1,
+            filter=_build_filter({"file_id": file_id}),
+            namespace=self.namespace,
+            include_metadata=True,
+        )
+
+        if not response.matches:
+            msg = f"No document found with file ID: {file_id}"
+            raise ValueError(msg)
+
+        # LlamaIndex stores the source document id on every vector it upserts
+        metadata = response.matches[0].metadata
+        doc_id = metadata.get("doc_id") or metadata.get("ref_doc_id")
+        if not doc_id:
+            msg = f"No source document ID stored for file ID: {file_id}"
+            raise ValueError(msg)
+        return doc_id
+
     def build(self) -> Any:
         """
         Validates the inputs and returns the component.
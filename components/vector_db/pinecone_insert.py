@@ -1,19 +1,125 @@
 from typing import List, Optional
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import aclosing
+from functools import partial
 
 from langflow.base.data import BaseFileComponent
 from langflow.base.data.utils import parallel_load_data
 from langflow.io import BoolInput, IntInput, SecretStrInput, FileInput, NestedDictInput, Output
 from langflow.base.data.utils import TEXT_FILE_TYPES
 from langflow.schema.message import Message
-from langflow.schema import Data, DataFrame
+from langflow.schema import DataFrame
 from pydantic import BaseModel, Field
 
 
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, Document
+from llama_index.core import SimpleDirectoryReader, Document
+from llama_index.core.schema import MetadataMode
 from llama_index.core.readers.file.base import default_file_metadata_func
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from llama_index.embeddings.openai import OpenAIEmbedding
-from pinecone import Pinecone
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from openai import AsyncOpenAI
+from pinecone.grpc import PineconeGRPC as Pinecone
+import tiktoken
+
+# Bound on each queue between the load -> chunk -> embed -> upsert stages
+PIPELINE_QUEUE_SIZE = 32
+# ada-002 accepts up to 2048 inputs per request but also caps the tokens per
+# request; 256 default-sized (<= 1024 token) chunks stays under that cap
+EMBED_BATCH_SIZE = 256
+EMBED_MODEL = "text-embedding-ada-002"
+# Embedding requests allowed in flight at once
+EMBED_CONCURRENCY = 20
+# Vectors per Pinecone upsert request
+UPSERT_BATCH_SIZE = 100
+# Formats slow enough to parse that a multi-file upload containing them is
+# worth spreading across processes; text formats parse faster in a thread
+PROCESS_POOL_SUFFIXES = {".pdf", ".docx"}
+
+# Spawned workers re-import llama_index, so the pool is created on first use
+# and kept for the life of the process
+_parse_pool = None
+
+
+def _get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+
+# Required upload metadata, built once at import rather than on every call
+class Schema(BaseModel):
+    source: str = Field(description = 'where this document came from')
+    user_id: str = Field(description = 'ivc email of uploader')
+    client: str = Field(description = 'client this document is for')
+    title: str = Field(description = 'the title of the document')
+    tag: list = Field(description = 'list of tags of the document e.g. ["cannabis"]')
+
+    class Config:
+        extra = "allow"
+
+
+class RateLimiter:
+    """Request and token budgets that refill continuously up to per-minute limits.
+
+    Same throttle as OpenAI's api_request_parallel_processor: a request waits until
+    both budgets can cover it, and the token estimate is corrected from the usage
+    reported in the response.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_requests = float(requests_per_minute)
+        self.available_tokens = float(tokens_per_minute)
+        self.last_update = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        self.available_requests = min(
+            self.requests_per_minute,
+            self.available_requests + self.requests_per_minute * elapsed / 60,
+        )
+        self.available_tokens = min(
+            self.tokens_per_minute,
+            self.available_tokens + self.tokens_per_minute * elapsed / 60,
+        )
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens are available, then take them."""
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.available_requests >= 1 and self.available_tokens >= tokens:
+                    self.available_requests -= 1
+                    self.available_tokens -= tokens
+                    return
+                # Sleep until the scarcer budget has refilled enough
+                await asyncio.sleep(max(
+                    (1 - self.available_requests) * 60 / self.requests_per_minute,
+                    (tokens - self.available_tokens) * 60 / self.tokens_per_minute,
+                    0.001,
+                ))
+
+    def record_usage(self, estimated_tokens: int, used_tokens: int):
+        """Refund or charge the difference between the estimate and actual usage."""
+        self.available_tokens = min(
+            self.tokens_per_minute,
+            self.available_tokens + estimated_tokens - used_tokens,
+        )
+
 
 class PineconeIndexerComponent(BaseFileComponent):
     """Process and index documents to Pinecone with parallel processing support.
@@ -69,6 +175,20 @@ class PineconeIndexerComponent(BaseFileComponent):
             required=True,
             info="Your OpenAI API key for embeddings"
         ),
+        IntInput(
+            name="requests_per_minute",
+            display_name="OpenAI Requests per Minute",
+            value=3000,
+            advanced=True,
+            info="Embedding request rate limit for your OpenAI tier"
+        ),
+        IntInput(
+            name="tokens_per_minute",
+            display_name="OpenAI Tokens per Minute",
+            value=1000000,
+            advanced=True,
+            info="Embedding token rate limit for your OpenAI tier"
+        ),
     ]
     
     outputs = [
@@ -82,20 +202,9 @@ class PineconeIndexerComponent(BaseFileComponent):
     ]
 
 
-    def process_files(self) -> DataFrame:
+    async def process_files(self) -> DataFrame:
         
         # validate Metadata
-        class Schema(BaseModel):
-            source: str = Field(description = 'where this document came from')
-            user_id: str = Field(description = 'ivc email of uploader')
-            client: str = Field(description = 'client this document is for')
-            title: str = Field(description = 'the title of the document')
-            tag: list = Field(description = 'list of tags of the document e.g. ["cannabis"]')
-                    
-            class Config:
-                extra = "allow"
-            
-            
         valid_meta = Schema(**self.metadata)
         
         file_list = [self.file] if isinstance(self.file, str) else self.file
@@ -116,87 +225,183 @@ class PineconeIndexerComponent(BaseFileComponent):
             # Initialize Pinecone and OpenAI
             pc = Pinecone(api_key=self.pinecone_api_key)
             pinecone_index = pc.Index("quickstart")
-            
-            embed_model = OpenAIEmbedding(
-                model="text-embedding-ada-002",
-                api_key=self.openai_api_key
-            )
-            
-            # Set up vector store
-            vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+            openai_client = AsyncOpenAI(api_key=self.openai_api_key, max_retries=5)
+            rate_limiter = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
 
             # Convert file objects to file paths
             file_paths = file_list
             self.log(file_paths)
-            print(file_paths)
 
             # Load documents from file paths
-            print("trying to make the documents using llama")
             reader = SimpleDirectoryReader(input_files=file_paths)
             
-            def custom_metadata(filename):
-
-                default_metadata = default_file_metadata_func(filename, fs=reader.fs)
-                
-                # Add custom metadata
-                custom_metadata = self.metadata
-                
-                # Merge default and custom metadata
-                merged_metadata = {**default_metadata, **custom_metadata}
-                
-                return merged_metadata
-            
-            reader.file_metadata = custom_metadata
-            documents = reader.load_data()
-            print("we made the documents!!!!!")
-           
-            
-            # Process each document and collect results
-            processed_data = []
-            print("starting the loop of documents")
-            i=0
-            for doc in documents:
-                i+=1
-                print("dealing with document", i)
-                try:
-                    # Extract file path and metadata
-                    print("getting the filepath: ")
-                    file_path = doc.metadata.get("file_path", "Unknown")
-                    print(file_path)
-                    
-                    print("________________")
-                    print("structuring the data:")
-                    data = Data(
-                        text=doc.text,
-                        data={
-                            "metadata": doc.metadata,
-                            "file_path": file_path,
-                        }
-                    )
-                    print("made the data!!!!!")
-                    print("appending the data")
-                    processed_data.append(data)
-                    print("appended the data!!!!")
-                except Exception as e:
-                    print(f"Error processing document: {str(e)}")
-                    self.log(f"Error processing document: {str(e)}")
-            print("all done with all", i, " documents!!!")
-            # Index documents to Pinecone
-            print("now lets try to turn this into a dataframe!")
-            self.log(f"Indexing {len(processed_data)} documents to Pinecone")
+            start = time.perf_counter()
             
-            VectorStoreIndex.from_documents(
-                documents,
-                storage_context=storage_context,
-                embed_model=embed_model
+            # Output columns, filled in as each document is parsed. The DataFrame
+            # returns every document's text, so all texts are held until the end.
+            texts, metadatas = [], []
+            doc_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            node_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            vector_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            # Run the stages concurrently, connected by bounded queues so a slow
+            # stage applies backpressure instead of buffering everything
+            await self._run_stages(
+                self._load_stage(reader, texts, metadatas, doc_queue),
+                self._chunk_stage(SentenceSplitter(), doc_queue, node_queue),
+                self._embed_stage(openai_client, rate_limiter, node_queue, vector_queue),
+                self._upsert_stage(pinecone_index, vector_queue),
             )
             
-            self.log("Successfully indexed documents to Pinecone")
-            result = DataFrame()
-            return result.add_rows(processed_data)
+            doc_file_paths = [metadata.get("file_path", "Unknown") for metadata in metadatas]
+            
+            elapsed = time.perf_counter() - start
+            self.log(f"Successfully indexed {len(texts)} documents to Pinecone in {elapsed:.2f}s")
+            return DataFrame({"text": texts, "metadata": metadatas, "file_path": doc_file_paths})
             
         except Exception as e:
             error_msg = f"Error during processing and indexing: {str(e)}"
             self.log(error_msg)
-            raise ValueError(error_msg) from e
\ No newline at end of file
+            raise ValueError(error_msg) from e
+
+    async def _run_stages(self, *stages):
+        """Run pipeline stages together. If one fails the TaskGroup cancels the
+        rest and waits for their cleanup before the error is raised."""
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for stage in stages:
+                    tg.create_task(stage)
+        except ExceptionGroup as eg:
+            # Raise the failing stage's own error so the message stays readable
+            error = eg
+            while isinstance(error, ExceptionGroup):
+                error = error.exceptions[0]
+            raise error from eg
+
+    async def _load_stage(self, reader, texts, metadatas, doc_queue):
+        """Parse the input files and feed each document to the chunker as soon
+        as its file is done, recording the output columns along the way."""
+        # The custom metadata is the same for every file, so copy it once
+        static_meta = dict(self.metadata)
+        async with aclosing(self._iter_files(reader)) as parsed_files:
+            async for file_docs in parsed_files:
+                for doc in file_docs:
+                    # Merge the custom metadata over the default file metadata
+                    doc.metadata.update(static_meta)
+                    texts.append(doc.text)
+                    metadatas.append(doc.metadata)
+                    await doc_queue.put(doc)
+        await doc_queue.put(None)
+
+    async def _iter_files(self, reader):
+        """Yield each input file's documents as soon as that file is parsed.
+
+        Parsing is CPU-bound, so multi-file uploads with PDFs or Word documents
+        are spread across the shared process pool, and files come back in
+        completion order so the chunker can start on the first one while the
+        slowest is still parsing. Anything lighter is parsed file by file in a
+        thread. Custom metadata is applied by the caller so nothing but library
+        functions has to be pickled.
+        """
+        load = [
+            partial(SimpleDirectoryReader.load_file, input_file, default_file_metadata_func, {})
+            for input_file in reader.input_files
+        ]
+        use_pool = len(load) > 1 and any(
+            input_file.suffix.lower() in PROCESS_POOL_SUFFIXES for input_file in reader.input_files
+        )
+        if not use_pool:
+            for load_file in load:
+                # load_file skips the metadata exclusions that load_data applies
+                yield reader._exclude_metadata(await asyncio.to_thread(load_file))
+            return
+
+        global _parse_pool
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(_get_parse_pool(), load_file) for load_file in load]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield reader._exclude_metadata(await future)
+        except BrokenProcessPool:
+            # A crashed worker breaks the pool for good; build a new one next time
+            _parse_pool = None
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def _chunk_stage(self, splitter, doc_queue, node_queue):
+        """Split each document into nodes."""
+        while (doc := await doc_queue.get()) is not None:
+            for node in splitter.get_nodes_from_documents([doc]):
+                await node_queue.put(node)
+        await node_queue.put(None)
+
+    async def _embed_stage(self, openai_client, rate_limiter, node_queue, vector_queue):
+        """Embed nodes in batches, with up to EMBED_CONCURRENCY requests in flight
+        and throttled to stay under the OpenAI rate limits."""
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+        encoding = tiktoken.encoding_for_model(EMBED_MODEL)
+
+        async def embed(batch):
+            try:
+                # ada-002 embeds better without newlines
+                texts = [
+                    node.get_content(metadata_mode=MetadataMode.EMBED).replace("\n", " ")
+                    for node in batch
+                ]
+                estimated_tokens = sum(len(encoding.encode(text)) for text in texts)
+                await rate_limiter.acquire(estimated_tokens)
+                response = await openai_client.embeddings.create(model=EMBED_MODEL, input=texts)
+                rate_limiter.record_usage(estimated_tokens, response.usage.total_tokens)
+                embeddings = [item.embedding for item in response.data]
+            finally:
+                semaphore.release()
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+                await vector_queue.put(node)
+
+        # The first failed request (bad key, hard quota) cancels the group and
+        # with it the whole pipeline, rather than surfacing after every batch
+        async with asyncio.TaskGroup() as tg:
+            async def submit(batch):
+                # Wait for a free slot before starting so batches don't pile up in memory
+                await semaphore.acquire()
+                tg.create_task(embed(batch))
+
+            batch = []
+            while (node := await node_queue.get()) is not None:
+                batch.append(node)
+                if len(batch) == EMBED_BATCH_SIZE:
+                    await submit(batch)
+                    batch = []
+            if batch:
+                await submit(batch)
+        await vector_queue.put(None)
+
+    async def _upsert_stage(self, pinecone_index, vector_queue):
+        """Upsert embedded nodes to Pinecone in batches.
+
+        Each batch is sent over gRPC with async_req=True so several upserts stay in
+        flight while the next batch is still being embedded.
+        Vectors are laid out the way PineconeVectorStore.add writes them.
+        """
+        futures = []
+        batch = []
+        while (node := await vector_queue.get()) is not None:
+            # Values stay float32: Pinecone dense indexes only store float32, so an
+            # int8/fp16 cast would be widened again server side. Over gRPC they are
+            # already sent as packed floats rather than JSON text.
+            batch.append({
+                "id": f"{node.ref_doc_id}#{node.node_id}",
+                "values": node.embedding,
+                "metadata": node_to_metadata_dict(node, remove_text=False, flat_metadata=False),
+            })
+            if len(batch) == UPSERT_BATCH_SIZE:
+                futures.append(pinecone_index.upsert(vectors=batch, async_req=True))
+                batch = []
+        if batch:
+            futures.append(pinecone_index.upsert(vectors=batch, async_req=True))
+
+        # The gRPC futures are concurrent.futures.Future, so await them directly
+        # rather than blocking in result() with its short default timeout
+        await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])